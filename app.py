@@ -1,97 +1,224 @@
 import os
-from fastapi import FastAPI, Depends
-from sqlalchemy import create_engine, text
-from sqlalchemy.orm import sessionmaker, Session
-from starlette.responses import StreamingResponse
-import json
 import datetime
+from typing import List, Optional
+from fastapi import FastAPI, Depends, Query
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from starlette.responses import StreamingResponse
 
 # --- Настройки ---
 DATABASE_URL = os.getenv("DATABASE_URL")
 TABLE_NAME = 'games'
+STREAM_BATCH_SIZE = 1000  # Сколько строк забирать с сервера БД за один раз
 
 # --- Инициализация приложения и БД ---
 app = FastAPI(
     title="Steam Games API",
     description="API для получения данных об играх из Steam (с использованием PostgreSQL и потоковой передачи).",
-    version="2.0.0"
+    version="2.0.0",
+    # Ответы сериализуются через orjson, минуя jsonable_encoder
+    default_response_class=ORJSONResponse
 )
 
 if not DATABASE_URL:
     raise RuntimeError("Переменная окружения DATABASE_URL не установлена!")
 
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def to_asyncpg_url(url: str) -> str:
+    """
+    Переводит строку подключения PostgreSQL на асинхронный драйвер asyncpg.
+    """
+    for prefix in ("postgresql+psycopg2://", "postgresql://", "postgres://"):
+        if url.startswith(prefix):
+            return "postgresql+asyncpg://" + url[len(prefix):]
+    return url
+
+# Асинхронный движок: запросы не блокируют event loop во время потоковой передачи
+engine = create_async_engine(to_asyncpg_url(DATABASE_URL), pool_pre_ping=True)
+SessionLocal = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
-# --- Потоковый генератор ---
-async def stream_games_from_db(db: Session, limit: int, offset: int):
+# --- Фильтры ---
+def build_where_clause(filters: dict):
+    """
+    Превращает параметры фильтрации в SQL-условие WHERE с именованными параметрами.
+    Фильтрация выполняется на стороне PostgreSQL, поэтому клиенту передаются
+    только подходящие игры, а запрос может использовать индексы.
+    """
+    conditions = []
+    params = {}
+
+    if filters.get('tags'):
+        # Индексируется GIN-индексом по string_to_array(tags, ',')
+        conditions.append("string_to_array(tags, ',') @> CAST(:tags AS text[])")
+        params['tags'] = list(filters['tags'])
+    if filters.get('date_from') is not None:
+        conditions.append("release_date >= :date_from")
+        params['date_from'] = filters['date_from']
+    if filters.get('date_to') is not None:
+        conditions.append("release_date <= :date_to")
+        params['date_to'] = filters['date_to']
+    if filters.get('price_min') is not None:
+        conditions.append("original_price >= :price_min")
+        params['price_min'] = filters['price_min']
+    if filters.get('price_max') is not None:
+        conditions.append("original_price <= :price_max")
+        params['price_max'] = filters['price_max']
+    if filters.get('reviews_min') is not None:
+        conditions.append("all_reviews_count >= :reviews_min")
+        params['reviews_min'] = filters['reviews_min']
+    if filters.get('reviews_max') is not None:
+        conditions.append("all_reviews_count <= :reviews_max")
+        params['reviews_max'] = filters['reviews_max']
+    if filters.get('after_id') is not None:
+        # Keyset-пагинация: в отличие от OFFSET использует индекс по game_id
+        conditions.append("game_id > :after_id")
+        params['after_id'] = filters['after_id']
+    if filters.get('up_to_id') is not None:
+        conditions.append("game_id <= :up_to_id")
+        params['up_to_id'] = filters['up_to_id']
+
+    where_sql = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return where_sql, params
+
+def game_filters(
+    tag: Optional[List[str]] = Query(None, description="Игра должна содержать все указанные теги"),
+    date_from: Optional[datetime.date] = None,
+    date_to: Optional[datetime.date] = None,
+    price_min: Optional[float] = None,
+    price_max: Optional[float] = None,
+    reviews_min: Optional[int] = None,
+    reviews_max: Optional[int] = None,
+):
+    """
+    Общие параметры фильтрации для маршрутов, отдающих список игр.
+    """
+    return {
+        'tags': tag,
+        'date_from': date_from,
+        'date_to': date_to,
+        'price_min': price_min,
+        'price_max': price_max,
+        'reviews_min': reviews_min,
+        'reviews_max': reviews_max,
+    }
+
+# --- Потоковые генераторы ---
+# Каждая строка сериализуется в JSON самим PostgreSQL (row_to_json),
+# поэтому Python лишь пересылает готовые байты клиенту
+SELECT_GAMES_JSON = f"SELECT row_to_json(g)::text FROM {TABLE_NAME} g"
+
+async def iter_games_json_batches(query, params):
+    """
+    Выполняет запрос и отдает строки результата пачками по STREAM_BATCH_SIZE:
+    каждая пачка - это список готовых JSON-объектов (bytes).
+    """
+    # Используем async with для гарантии закрытия соединения.
+    # stream() открывает серверный курсор: строки приходят из PostgreSQL
+    # порциями по STREAM_BATCH_SIZE, а не загружаются в память целиком.
+    async with engine.connect() as connection:
+        await connection.execution_options(postgresql_readonly=True)
+        result = await connection.stream(
+            query, params, execution_options={'yield_per': STREAM_BATCH_SIZE}
+        )
+
+        async for partition in result.scalars().partitions(STREAM_BATCH_SIZE):
+            yield [game_json.encode() for game_json in partition]
+
+async def stream_games_from_db(db: AsyncSession, limit: int, offset: int, filters: dict = None):
     """
     Асинхронный генератор, который получает данные из БД порциями и отдает их
     в виде JSON-строк. Это позволяет избежать загрузки всего результата в память.
     """
+    where_sql, params = build_where_clause(filters or {})
+
     if limit:
-        query = text(f"SELECT * FROM {TABLE_NAME} LIMIT :limit OFFSET :offset")
-        params = {'limit': limit, 'offset': offset}
+        query = text(f"{SELECT_GAMES_JSON} {where_sql} LIMIT :limit OFFSET :offset")
+        params.update({'limit': limit, 'offset': offset})
     else:
-        query = text(f"SELECT * FROM {TABLE_NAME} OFFSET :offset")
-        params = {'offset': offset}
-
-    # Используем with для гарантии закрытия соединения
-    with engine.connect() as connection:
-        # Выполняем запрос с потоковой передачей результатов
-        result = connection.execute(query, params)
-        
-        # Начинаем формирование JSON-массива
-        yield '['
-        
-        first = True
-        for row in result:
-            if not row:
-                continue
-
-            # Преобразуем каждую строку в словарь
-            row_dict = dict(row._mapping)
-            if not row_dict:
-                continue
-            
-            # Заменяем Python-специфичные значения на JSON-совместимые
-            for key, value in row_dict.items():
-                if value is None or (isinstance(value, float) and (value != value or value == float('inf') or value == float('-inf'))):
-                    row_dict[key] = None
-
-            if not first:
-                yield ','
-            
-            # Используем кастомный обработчик для дат
-            def date_converter(o):
-                if isinstance(o, (datetime.date, datetime.datetime)):
-                    return o.isoformat()
-            
-            yield json.dumps(row_dict, default=date_converter)
-            first = False
-        
-        # Завершаем JSON-массив
-        yield ']'
+        query = text(f"{SELECT_GAMES_JSON} {where_sql} OFFSET :offset")
+        params['offset'] = offset
+
+    # Начинаем формирование JSON-массива
+    yield b'['
+
+    # Отправляем по одной пачке строк за раз, а не по строке:
+    # так на весь ответ приходится в STREAM_BATCH_SIZE раз меньше отправок
+    separator = b''
+    async for batch in iter_games_json_batches(query, params):
+        yield separator + b','.join(batch)
+        separator = b','
+
+    # Завершаем JSON-массив
+    yield b']'
+
+async def stream_games_ndjson(limit: int, after_id: int, up_to_id: int = None, filters: dict = None):
+    """
+    Асинхронный генератор в формате NDJSON: по одному JSON-объекту на строку.
+    Клиент может разбирать строки по мере их поступления, не дожидаясь конца ответа.
+    """
+    where_sql, params = build_where_clause({**(filters or {}), 'after_id': after_id, 'up_to_id': up_to_id})
+
+    query_sql = f"{SELECT_GAMES_JSON} {where_sql} ORDER BY game_id"
+    if limit:
+        query_sql += " LIMIT :limit"
+        params['limit'] = limit
+
+    async for batch in iter_games_json_batches(text(query_sql), params):
+        yield b'\n'.join(batch) + b'\n'
 
 # --- Маршруты API (Endpoints) ---
-@app.get("/api/v1/games")
-async def get_games_stream(limit: int = None, offset: int = 0, db: Session = Depends(get_db)):
+@app.get("/api/v1/games", response_model=None)
+async def get_games_stream(
+    limit: int = None,
+    offset: int = 0,
+    filters: dict = Depends(game_filters),
+    db: AsyncSession = Depends(get_db)
+):
     """
     Возвращает список игр в виде потокового JSON-ответа (streaming response).
     Это позволяет обрабатывать большие объемы данных с минимальным использованием памяти.
+    Необязательные параметры фильтрации применяются на стороне базы данных.
     """
     return StreamingResponse(
-        stream_games_from_db(db, limit, offset),
+        stream_games_from_db(db, limit, offset, filters),
         media_type="application/json"
     )
 
+@app.get("/api/v1/games.ndjson", response_model=None)
+async def get_games_ndjson(
+    limit: int = None,
+    after_id: Optional[int] = None,
+    up_to_id: Optional[int] = None,
+    filters: dict = Depends(game_filters)
+):
+    """
+    Возвращает игры одним потоком в формате NDJSON, отсортированными по game_id.
+    Для постраничной загрузки передайте в after_id последний полученный game_id.
+    Диапазон (after_id, up_to_id] позволяет загружать части таблицы параллельно.
+    """
+    return StreamingResponse(
+        stream_games_ndjson(limit, after_id, up_to_id, filters),
+        media_type="application/x-ndjson"
+    )
+
+@app.get("/api/v1/games/stats")
+async def get_games_stats(
+    filters: dict = Depends(game_filters),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Возвращает количество игр и диапазон их game_id. Клиент использует диапазон,
+    чтобы разбить загрузку на несколько параллельных запросов.
+    """
+    where_sql, params = build_where_clause(filters)
+    query = text(f"SELECT count(*) AS count, min(game_id) AS min_id, max(game_id) AS max_id FROM {TABLE_NAME} {where_sql}")
+    result = await db.execute(query, params)
+    return dict(result.mappings().one())
+
 @app.get("/")
 def read_root():
     """
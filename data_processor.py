@@ -1,13 +1,25 @@
 import pandas as pd
 from umap import UMAP
 import numpy as np
-from sklearn.preprocessing import normalize
+from sklearn.feature_extraction.text import CountVectorizer
 import math
+import re
 
 # --- Константы ---
 SOURCE_FILE = 'games_cleaned.parquet'
 TARGET_FILE = 'games_with_coords.parquet'
 EXCLUDED_TAGS = {'Early_Access', 'Free_to_Play', 'Steam_Machine', 'Controller'}
+# Регулярное выражение для удаления исключенных тегов вместе с предшествующей запятой
+EXCLUDED_TAGS_PATTERN = re.compile(
+    r'(?:^|,)(?:' + '|'.join(re.escape(tag) for tag in sorted(EXCLUDED_TAGS)) + r')(?=,|$)'
+)
+
+
+def split_tags(tags):
+    """
+    Разбивает строку тегов через запятую на список, пропуская пустые значения.
+    """
+    return [tag for tag in tags.split(',') if tag]
 
 
 def create_binary_vectors(tags_series):
@@ -15,11 +27,19 @@ def create_binary_vectors(tags_series):
     Создает бинарные векторы для каждой игры (мешок слов).
     1, если тег присутствует у игры, 0 - в противном случае.
     """
-    # get_dummies отлично справляется с этой задачей, создавая бинарную матрицу
-    # где строки - это игры, а столбцы - это все уникальные теги.
-    binary_matrix = tags_series.str.get_dummies(sep=',')
+    # CountVectorizer строит разреженную (CSR) матрицу, где строки - это игры,
+    # а столбцы - это все уникальные теги. Почти все ее элементы - нули,
+    # поэтому хранятся только единицы
+    vectorizer = CountVectorizer(
+        tokenizer=split_tags,
+        token_pattern=None,
+        lowercase=False,
+        binary=True,
+        dtype=np.float32,
+    )
+    binary_matrix = vectorizer.fit_transform(tags_series)
     
-    return binary_matrix.values, binary_matrix.columns.tolist()
+    return binary_matrix, vectorizer.get_feature_names_out().tolist()
 
 
 def main():
@@ -28,12 +48,14 @@ def main():
     1. Читает данные из Parquet.
     2. Обрабатывает теги.
     3. Создает бинарную матрицу векторов (мешок слов) для каждой игры.
-    4. Снижает размерность с помощью UMAP.
+    4. Снижает размерность с помощью UMAP (косинусное расстояние).
     5. Сохраняет результат в новый Parquet файл.
     """
     print("Шаг 1: Чтение данных...")
     try:
-        games_df = pd.read_parquet(SOURCE_FILE)
+        # Колонки остаются в Arrow-представлении: строки не превращаются
+        # в Python-объекты при чтении
+        games_df = pd.read_parquet(SOURCE_FILE, dtype_backend='pyarrow')
         print(f"Загружено {len(games_df)} игр.")
 
         # --- Обработка данных ---
@@ -51,40 +73,54 @@ def main():
 
         print("Шаг 3: Векторизация тегов (создание бинарной матрицы)...")
         
-        # 3.1. Фильтруем теги
-        tags_series = games_with_tags_df['cleaned_tags'].apply(
-            lambda x: ','.join([tag for tag in x.split(',') if tag not in EXCLUDED_TAGS])
+        # 3.1. Фильтруем теги одной векторной заменой по регулярному выражению.
+        # Arrow-строки (ArrowDtype) не принимают скомпилированный шаблон,
+        # поэтому для этого шага колонка приводится к StringDtype
+        tags_series = (
+            games_with_tags_df['cleaned_tags']
+            .astype(pd.StringDtype('pyarrow'))
+            .str.replace(EXCLUDED_TAGS_PATTERN, '', regex=True)
+            .str.strip(',')
         )
         
         # 3.2. Создаем бинарные векторы
         binary_matrix, all_tags_vocab = create_binary_vectors(tags_series)
         
-        # 3.3. Нормализуем векторы (важно для косинусного расстояния)
-        normalized_matrix = normalize(binary_matrix, norm='l2', axis=1)
-
         print("Шаг 4: Снижение размерности (UMAP)...")
-        # UMAP хорошо работает с параметрами по умолчанию
-        # Используем нормализованную матрицу
-        umap_reducer = UMAP(n_components=2, random_state=42, n_neighbors=15, min_dist=0.1)
-        embedding = umap_reducer.fit_transform(normalized_matrix)
+        # UMAP сам считает косинусное расстояние, поэтому отдельная
+        # L2-нормализация матрицы не нужна. n_jobs=-1 распараллеливает поиск соседей.
+        # Инициализация через PCA (TruncatedSVD для разреженной матрицы) не требует
+        # спектрального разложения графа, которое на больших данных долгое и затратное по памяти.
+        # random_state оставлен ради воспроизводимой карты, хотя с ним UMAP работает в один поток
+        umap_reducer = UMAP(
+            n_components=2,
+            metric='cosine',
+            n_neighbors=15,
+            min_dist=0.1,
+            init='pca',
+            random_state=42,
+            low_memory=True,
+            n_jobs=-1,
+        )
+        embedding = umap_reducer.fit_transform(binary_matrix)
 
-        # Добавляем координаты в DataFrame
-        games_with_tags_df['x'] = embedding[:, 0]
-        games_with_tags_df['y'] = embedding[:, 1]
-        
         # --- Сохранение результата ---
         print(f"Шаг 5: Сохранение результата в '{TARGET_FILE}'...")
         
-        # Объединяем результат с исходным DataFrame, чтобы добавить координаты
-        # Играм без тегов присвоится NaN в качестве координат
-        final_df = pd.merge(games_df, games_with_tags_df[['game_id', 'x', 'y']], on='game_id', how='left')
+        # Записываем координаты прямо в исходный DataFrame по индексу
+        # (games_with_tags_df - его подмножество с теми же индексами).
+        # Играм без тегов достанется NaN в качестве координат
+        games_df['x'] = np.full(len(games_df), np.nan, dtype=embedding.dtype)
+        games_df['y'] = np.full(len(games_df), np.nan, dtype=embedding.dtype)
+        games_df.loc[games_with_tags_df.index, 'x'] = embedding[:, 0]
+        games_df.loc[games_with_tags_df.index, 'y'] = embedding[:, 1]
 
         # Заменяем исходную колонку 'tags' на очищенную
-        final_df['tags'] = final_df['cleaned_tags']
+        games_df['tags'] = games_df['cleaned_tags']
         # Удаляем временную колонку
-        final_df = final_df.drop(columns=['cleaned_tags'])
+        games_df.drop(columns=['cleaned_tags'], inplace=True)
         
-        final_df.to_parquet(TARGET_FILE, index=False)
+        games_df.to_parquet(TARGET_FILE, index=False)
         
         print("-" * 30)
         print("Обработка успешно завершена!")
@@ -1,9 +1,17 @@
 import streamlit as st
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import plotly.express as px
 import plotly.graph_objects as go
+import plotly.io as pio
 import numpy as np
+import uuid
+import numexpr as ne
+from scipy.sparse import csr_matrix
+import pyarrow as pa
+import pyarrow.json as pa_json
 
 # --- Настройки страницы ---
 st.set_page_config(
@@ -13,180 +21,307 @@ st.set_page_config(
 )
 
 # --- Константы ---
-# Запрашиваем большое количество игр, чтобы получить всю базу
-# API вернет столько, сколько есть, если их меньше
-API_BASE_URL = "https://steam-map-project.onrender.com/api/v1/games"
+API_BASE_URL = "https://steam-map-project.onrender.com/api/v1"
+# Игры загружаются в формате NDJSON несколькими параллельными запросами,
+# каждый из которых забирает свой диапазон game_id
+GAMES_URL = f"{API_BASE_URL}/games.ndjson"
+STATS_URL = f"{API_BASE_URL}/games/stats"
+FETCH_WORKERS = 8
+# Типы колонок, которые использует карта. Остальные колонки pyarrow определит сам
+API_SCHEMA = pa.schema([
+    ('title', pa.string()),
+    ('tags', pa.string()),
+    ('release_date', pa.string()),
+    ('original_price', pa.float64()),
+    ('all_reviews_count', pa.float64()),
+    ('x', pa.float32()),
+    ('y', pa.float32()),
+])
+
+# Plotly сериализует график в JSON через orjson: он кодирует numpy-массивы
+# на C, без поэлементного форматирования чисел в Python
+pio.json.config.default_engine = 'orjson'
+
+# Одна HTTP-сессия на все запросы: соединения с API переиспользуются (keep-alive).
+# Пул соединений рассчитан на все параллельные запросы
+http_session = requests.Session()
+http_session.mount("https://", HTTPAdapter(pool_maxsize=FETCH_WORKERS))
+http_session.mount("http://", HTTPAdapter(pool_maxsize=FETCH_WORKERS))
 
 # --- Подключение к данным ---
-@st.cache_data
-def load_all_data_in_chunks():
+def fetch_games_range(after_id, up_to_id):
     """
-    Загружает все данные с API по частям (пагинация), чтобы избежать таймаутов
-    при работе с большими объемами данных. Показывает прогресс-бар.
+    Загружает игры с game_id в диапазоне (after_id, up_to_id] и разбирает
+    ответ (NDJSON) pyarrow сразу в колоночную таблицу.
     """
-    all_data = []
-    offset = 0
-    chunk_size = 10000  # Запрашиваем по 10 000 игр за раз
+    response = http_session.get(GAMES_URL, params={'after_id': after_id, 'up_to_id': up_to_id}, timeout=60)
+    response.raise_for_status()
+    if not response.content:
+        return None
+    return pa_json.read_json(
+        pa.BufferReader(response.content),
+        parse_options=pa_json.ParseOptions(explicit_schema=API_SCHEMA),
+    )
 
+@st.cache_data
+def load_all_data():
+    """
+    Загружает все данные с API. Диапазон game_id делится на FETCH_WORKERS частей,
+    которые скачиваются параллельно: загрузка упирается в сеть, а не в процессор,
+    поэтому потоки ускоряют ее почти пропорционально. Показывает прогресс-бар.
+    """
     with st.spinner("Загрузка данных об играх... Это может занять некоторое время."):
         progress_bar = st.progress(0, text="Начинаем загрузку...")
-        total_games_loaded = 0
-
-        while True:
-            try:
-                # Формируем URL с пагинацией
-                paginated_url = f"{API_BASE_URL}?limit={chunk_size}&offset={offset}"
-                response = requests.get(paginated_url, timeout=60) # Увеличиваем таймаут на всякий случай
-                response.raise_for_status()
-                
-                chunk = response.json()
-                
-                # Если API вернул пустой список, значит, мы загрузили все данные
-                if not chunk:
-                    progress_bar.progress(1.0, text="Загрузка завершена!")
-                    break
-                
-                all_data.extend(chunk)
-                total_games_loaded += len(chunk)
-                
-                # Обновляем прогресс-бар (это примерная оценка, т.к. мы не знаем общего числа)
-                # Просто показываем, что процесс идет
-                progress_bar.progress(min(1.0, (offset + chunk_size) / 150000), text=f"Загружено {total_games_loaded} игр...")
-
-                offset += chunk_size
-
-            except requests.exceptions.RequestException as e:
-                st.error(f"Не удалось подключиться к API: {e}. Убедитесь, что FastAPI сервер запущен.")
+
+        try:
+            stats_response = http_session.get(STATS_URL, timeout=60)
+            stats_response.raise_for_status()
+            stats = stats_response.json()
+            if not stats['count']:
                 return pd.DataFrame()
 
-    # Вместо создания большого DataFrame, просто отфильтруем "сырой" список
-    filtered_data = [item for item in all_data if item.get('x') is not None and item.get('y') is not None]
-    return filtered_data
+            # Границы диапазонов: (bounds[i], bounds[i + 1]]
+            bounds = np.unique(np.linspace(stats['min_id'] - 1, stats['max_id'], FETCH_WORKERS + 1).astype(np.int64))
+            ranges = list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
 
-# --- Основная часть приложения ---
-# Загрузка данных
-games_df = load_all_data_in_chunks()
+            tables = [None] * len(ranges)
+            with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as executor:
+                futures = {executor.submit(fetch_games_range, *bounds_pair): i for i, bounds_pair in enumerate(ranges)}
+                for done, future in enumerate(as_completed(futures), start=1):
+                    tables[futures[future]] = future.result()
+                    progress_bar.progress(done / len(ranges), text=f"Загружено частей: {done} из {len(ranges)}...")
 
-if games_df: # games_df теперь это список словарей
-    st.sidebar.title("Фильтры")
+            progress_bar.progress(1.0, text="Загрузка завершена!")
 
-    # --- Преобразуем "сырые" данные в DataFrame только для расчетов ---
-    # Это все равно будет занимать память, но мы можем это оптимизировать позже,
-    # если это останется проблемой. Основная проблема была в создании DataFrame из ВСЕХ данных.
-    df_for_calcs = pd.DataFrame(games_df)
-    df_for_calcs['release_date'] = pd.to_datetime(df_for_calcs['release_date'], errors='coerce')
-    df_for_calcs.dropna(subset=['release_date'], inplace=True)
-    
-    # --- Фильтры ---
-    # 1. Фильтр по названию игры (для выделения)
-    sorted_game_names = sorted(df_for_calcs['title'].unique())
-    selected_game = st.sidebar.selectbox("Найти и выделить игру:", options=[""] + sorted_game_names, index=0)
+        except (requests.exceptions.RequestException, pa.ArrowInvalid) as e:
+            st.error(f"Не удалось загрузить данные из API: {e}. Убедитесь, что FastAPI сервер запущен.")
+            return pd.DataFrame()
 
-    # 2. Фильтр по тегам
-    all_tags_internal = set()
-    df_for_calcs['tags'].dropna().str.split(',').apply(all_tags_internal.update)
-    tag_display_map = {tag.replace('_', ' '): tag for tag in all_tags_internal if tag}
-    sorted_display_tags = sorted(tag_display_map.keys())
-    selected_display_tags = st.sidebar.multiselect("Теги:", options=sorted_display_tags)
+    # Части идут в порядке game_id; пустые диапазоны пропускаем
+    games_table = pa.concat_tables([table for table in tables if table is not None], promote_options="default")
 
-    # 2. Фильтр по дате релиза
-    min_date, max_date = df_for_calcs['release_date'].min().to_pydatetime(), df_for_calcs['release_date'].max().to_pydatetime()
-    col1, col2 = st.sidebar.columns(2)
-    with col1:
-        start_date = st.date_input("Дата релиза от:", value=min_date, min_value=min_date, max_value=max_date)
-    with col2:
-        end_date = st.date_input("Дата релиза до:", value=max_date, min_value=min_date, max_value=max_date)
-    start_date, end_date = pd.to_datetime(start_date), pd.to_datetime(end_date)
+    # Игры без координат на карте не отображаются
+    games_df = games_table.to_pandas(split_blocks=True, self_destruct=True)
+    return games_df.dropna(subset=['x', 'y']).reset_index(drop=True)
 
-    # 3. Фильтр по цене
-    # Убедимся, что колонка с ценой числовая
-    df_for_calcs['original_price'] = pd.to_numeric(df_for_calcs['original_price'], errors='coerce').fillna(0)
-    min_price, max_price = df_for_calcs['original_price'].min(), df_for_calcs['original_price'].max()
-    col1, col2 = st.sidebar.columns(2)
-    with col1:
-        price_from = st.number_input("Цена от ($):", min_value=float(min_price), max_value=float(max_price), value=float(min_price))
-    with col2:
-        price_to = st.number_input("Цена до ($):", min_value=float(min_price), max_value=float(max_price), value=float(max_price))
+def build_tag_index(tags):
+    """
+    Строит разреженную бинарную матрицу "набор тегов x тег" (1, если тег входит
+    в набор), словарь "тег -> номер столбца" и словарь "отображаемое имя тега ->
+    внутреннее имя". tags - категориальная колонка, поэтому матрица строится по
+    уникальным наборам тегов, а не по всем играм: строка игры в ней - это код
+    категории. Вызывается из кэшируемого preprocess, поэтому при изменении
+    фильтров не пересчитывается.
+    """
+    exploded = pd.Series(tags.cat.categories).str.split(',').explode()
+    exploded = exploded[exploded.notna() & (exploded != '')]
+    tag_categorical = pd.Categorical(exploded)
 
-    # 4. Фильтр по количеству отзывов
-    df_for_calcs['all_reviews_count'] = pd.to_numeric(df_for_calcs['all_reviews_count'], errors='coerce').fillna(0)
-    min_reviews, max_reviews = int(df_for_calcs['all_reviews_count'].min()), int(df_for_calcs['all_reviews_count'].max())
-    col1, col2 = st.sidebar.columns(2)
-    with col1:
-        reviews_from = st.number_input("Отзывов от:", min_value=min_reviews, max_value=max_reviews, value=min_reviews)
-    with col2:
-        reviews_to = st.number_input("Отзывов до:", min_value=min_reviews, max_value=max_reviews, value=max_reviews)
+    tag_matrix = csr_matrix(
+        (np.ones(len(exploded), dtype=np.int8), (exploded.index.to_numpy(), tag_categorical.codes)),
+        shape=(len(tags.cat.categories), len(tag_categorical.categories)),
+    )
+    # Повторы тега внутри одного набора при построении суммируются - приводим к 0/1.
+    # CSC-формат быстро выбирает отдельные столбцы (теги)
+    tag_matrix.data[:] = 1
+    tag_matrix = tag_matrix.tocsc()
 
-    # --- Применение фильтров (теперь на списке словарей) ---
-    filtered_games = []
-    for game in games_df:
-        # Пропускаем игры с неполными данными
-        if not all(k in game and game[k] is not None for k in ['release_date', 'original_price', 'all_reviews_count', 'tags']):
-            continue
+    tag_columns = {tag: i for i, tag in enumerate(tag_categorical.categories)}
+    tag_display_map = {tag.replace('_', ' '): tag for tag in tag_categorical.categories}
+    return tag_matrix, tag_columns, tag_display_map
+
+def games_fingerprint(games_df):
+    """
+    Дешевый ключ кэша для таблицы игр: размер и сумма game_id вместо
+    хеширования содержимого всех колонок при каждом запуске скрипта.
+    """
+    return games_df.shape, int(games_df['game_id'].sum())
+
+@st.cache_resource(hash_funcs={pd.DataFrame: games_fingerprint})
+def preprocess(games_df):
+    """
+    Готовит загруженные данные к фильтрации: приводит типы, отбрасывает игры
+    с неполными данными, строит индекс тегов и считает границы для фильтров.
+    Результат зависит только от ответа API, поэтому кэшируется и не
+    пересчитывается при каждом изменении виджетов.
+    cache_resource отдает один и тот же объект без копирования: результат
+    только читается и не должен изменяться.
+    """
+    df = games_df.copy()
+    df['release_date'] = pd.to_datetime(df['release_date'], errors='coerce')
+    df['original_price'] = pd.to_numeric(df['original_price'], errors='coerce')
+    df['all_reviews_count'] = pd.to_numeric(df['all_reviews_count'], errors='coerce')
+    # Игры с неполными данными на карту не попадают
+    df = df.dropna(subset=['release_date', 'original_price', 'all_reviews_count', 'tags'])
+    # Сортировка по дате релиза: фильтр по датам превращается в поиск границ
+    # диапазона (np.searchsorted) вместо сравнения каждой строки
+    df = df.sort_values('release_date', kind='stable').reset_index(drop=True)
+
+    # Названия и наборы тегов часто повторяются: в категориальном виде каждая
+    # строка хранится один раз, а сравнения и сортировка идут по целым кодам
+    df['title'] = df['title'].astype('category')
+    df['tags'] = df['tags'].astype('category')
+
+    # Колонки, которые нужны только для графика
+    df['log_reviews'] = np.log10(df['all_reviews_count'] + 1).astype(np.float32)
+    # float32/int32 вместо float64: вдвое меньше данных для передачи в браузер
+    # и в буферы WebGL. Приводим один раз здесь, а не при каждой сборке графика
+    df[['x', 'y']] = df[['x', 'y']].astype(np.float32)
+    df['all_reviews_count'] = df['all_reviews_count'].astype(np.int32)
+    # map для категориальной колонки вызывается один раз на категорию
+    df['display_tags'] = df['tags'].map(lambda tags: tags.replace('_', ' ').replace(',', ', '))
+
+    tag_matrix, tag_columns, tag_display_map = build_tag_index(df['tags'])
+
+    return {
+        # Метка набора данных для кэша графиков: остается той же, пока
+        # не изменится результат preprocess
+        'data_key': uuid.uuid4().hex,
+        'games': df,
+        # Колонки для фильтров в виде numpy-массивов: сравнения с ними
+        # не проходят через создание Series и выравнивание индексов pandas
+        # Даты храним в микросекундах: в данных встречаются даты вроде 9998 года,
+        # которые не помещаются в наносекундное представление
+        'release_us': df['release_date'].to_numpy(dtype='datetime64[us]').view(np.int64),
+        'price': df['original_price'].to_numpy(dtype=np.float64),
+        'reviews': df['all_reviews_count'].to_numpy(dtype=np.float64),
+        'title_codes': df['title'].cat.codes.to_numpy(),
+        'tag_codes': df['tags'].cat.codes.to_numpy(),
+        'tag_matrix': tag_matrix,
+        'tag_columns': tag_columns,
+        'tag_display_map': tag_display_map,
+        'sorted_game_names': sorted(df['title'].cat.categories),
+        'sorted_display_tags': sorted(tag_display_map.keys()),
+        'min_date': df['release_date'].min().to_pydatetime(),
+        'max_date': df['release_date'].max().to_pydatetime(),
+        'min_price': float(df['original_price'].min()),
+        'max_price': float(df['original_price'].max()),
+        'min_reviews': int(df['all_reviews_count'].min()),
+        'max_reviews': int(df['all_reviews_count'].max()),
+        # Границы цветовой шкалы по всем играм: цвет точки не зависит
+        # от фильтров, и шкала не пересчитывается при каждой отрисовке
+        'min_log_reviews': float(df['log_reviews'].min()),
+        'max_log_reviews': float(df['log_reviews'].max()),
+    }
 
-        # Фильтр по дате
-        try:
-            game_date = pd.to_datetime(game['release_date'])
-            if not (start_date <= game_date <= end_date):
-                continue
-        except (ValueError, TypeError):
-            continue
-
-        # Фильтр по цене
-        if not (price_from <= game['original_price'] <= price_to):
-            continue
-        
-        # Фильтр по отзывам
-        if not (reviews_from <= game['all_reviews_count'] <= reviews_to):
-            continue
-
-        # Фильтр по тегам
-        if selected_display_tags:
-            selected_internal_tags = {tag_display_map[tag] for tag in selected_display_tags}
-            game_tags = set(game['tags'].split(','))
-            if not selected_internal_tags.issubset(game_tags):
-                continue
-        
-        filtered_games.append(game)
+
+@st.cache_resource(max_entries=32)
+def build_figure(_prepared, data_key, selected_game, selected_tags, start_us, end_us, price_from, price_to, reviews_from, reviews_to):
+    """
+    Применяет фильтры и строит график. Кэшируется по состоянию фильтров:
+    повторные запуски скрипта с теми же значениями виджетов (например, при
+    изменении размера окна) получают готовый Figure без пересчета.
+    _prepared не хешируется - данные идентифицирует data_key.
+    """
+    prepared = _prepared
+    df_for_calcs = prepared['games']
+    tag_matrix = prepared['tag_matrix']
+    tag_display_map = prepared['tag_display_map']
+
+    # --- Применение фильтров (векторно, на numpy-массивах) ---
+    # Игры отсортированы по дате, поэтому фильтр по датам - это срез [lo:hi],
+    # найденный двоичным поиском. Остальные условия проверяются только внутри среза
+    lo = np.searchsorted(prepared['release_us'], start_us, side='left')
+    hi = np.searchsorted(prepared['release_us'], end_us, side='right')
+    # Если дата "от" позже даты "до", срез пустой, а не отрицательной длины
+    hi = max(hi, lo)
+
+    # Если диапазоны цены и отзывов покрывают все данные, условие заведомо
+    # выполняется для всех игр и вычислять его не нужно
+    ranges_are_full = (
+        price_from <= prepared['min_price'] and price_to >= prepared['max_price']
+        and reviews_from <= prepared['min_reviews'] and reviews_to >= prepared['max_reviews']
+    )
+    if ranges_are_full:
+        range_mask = np.ones(hi - lo, dtype=bool)
+    else:
+        # numexpr вычисляет выражение целиком за один проход, без промежуточной
+        # булевой маски на каждое условие
+        range_mask = ne.evaluate(
+            "(price >= price_from) & (price <= price_to)"
+            " & (reviews >= reviews_from) & (reviews <= reviews_to)",
+            local_dict={
+                'price': prepared['price'][lo:hi],
+                'reviews': prepared['reviews'][lo:hi],
+                'price_from': float(price_from),
+                'price_to': float(price_to),
+                'reviews_from': float(reviews_from),
+                'reviews_to': float(reviews_to),
+            },
+        )
+
+    # Фильтр по тегам: игра должна содержать все выбранные теги
+    if selected_tags:
+        selected_internal_tags = [tag_display_map[tag] for tag in selected_tags]
+        selected_columns = [prepared['tag_columns'][tag] for tag in selected_internal_tags]
+        # Набор подходит, если в нем есть все выбранные теги: сумма по выбранным
+        # столбцам разреженной матрицы равна их количеству. Затем переносим
+        # результат с наборов тегов на игры по кодам
+        tags_found = np.asarray(tag_matrix[:, selected_columns].sum(axis=1)).ravel()
+        matching_tag_sets = tags_found == len(selected_columns)
+        range_mask &= matching_tag_sets[prepared['tag_codes'][lo:hi]]
+
+    mask = np.zeros(len(df_for_calcs), dtype=bool)
+    mask[lo:hi] = range_mask
+
+    # Выделенная игра ищется по целочисленному коду названия, без сравнения строк
+    if selected_game:
+        selected_code = df_for_calcs['title'].cat.categories.get_loc(selected_game)
 
     # --- Подготовка данных для графика ---
-    plot_df = pd.DataFrame(filtered_games) if filtered_games else pd.DataFrame()
-    
-    if not plot_df.empty:
-        plot_df['log_reviews'] = np.log10(plot_df['all_reviews_count'] + 1)
-        plot_df['display_tags'] = plot_df['tags'].str.replace('_', ' ').str.replace(',', ', ')
+    # Без активных фильтров берем таблицу целиком, без копирования по маске
+    plot_df = df_for_calcs if mask.all() else df_for_calcs[mask]
 
+    fig = go.Figure()
+    if not plot_df.empty:
         # --- Логика выделения ---
+        # От значений по умолчанию отличаются только строки выбранной игры
+        # (обычно одна), поэтому массивы заполняются константой, а выделение
+        # записывается точечно по индексам. Цвет обводки общий: у невыделенных
+        # точек ширина обводки 0, и отдельный массив цветов не нужен
         if selected_game:
-            plot_df['size'] = np.where(plot_df['title'] == selected_game, 12, 6)
-            plot_df['line_color'] = np.where(plot_df['title'] == selected_game, 'red', 'rgba(0,0,0,0)')
-            plot_df['line_width'] = np.where(plot_df['title'] == selected_game, 2, 0)
+            selected_idx = np.flatnonzero(plot_df['title'].cat.codes.to_numpy() == selected_code)
+            # Точки рисуются в порядке строк, поэтому выбранную игру переносим
+            # в конец, чтобы она оказалась поверх соседних. Остальные строки
+            # уже упорядочены в preprocess, и сортировка не нужна
+            if len(selected_idx):
+                other_idx = np.setdiff1d(np.arange(len(plot_df)), selected_idx, assume_unique=True)
+                plot_df = plot_df.iloc[np.concatenate([other_idx, selected_idx])]
+                selected_idx = np.arange(len(other_idx), len(plot_df))
+            marker_size = np.full(len(plot_df), 6, dtype=np.uint8)
+            marker_size[selected_idx] = 12
+            line_width = np.zeros(len(plot_df), dtype=np.uint8)
+            line_width[selected_idx] = 2
         else:
-            plot_df['size'] = 6
-            plot_df['line_color'] = 'rgba(0,0,0,0)'
-            plot_df['line_width'] = 0
+            marker_size = 6
+            line_width = 0
 
         # --- Создание интерактивного графика ---
-        fig = go.Figure()
+        # Передаем numpy-массивы, а не Series: Plotly кодирует их как бинарные
+        # typed arrays вместо списков чисел в JSON
         fig.add_trace(go.Scattergl(
-            x=plot_df['x'],
-            y=plot_df['y'],
-            customdata=plot_df[['display_tags', 'all_reviews_count']],
+            x=plot_df['x'].to_numpy(),
+            y=plot_df['y'].to_numpy(),
+            # Число отзывов - отдельный числовой массив: он тоже уходит как typed
+            # array, тогда как смешанный массив со строками превращался в JSON-списки.
+            # Подсказка не умеет искать строку по коду категории, поэтому теги
+            # передаются строками через hovertext
+            customdata=plot_df['all_reviews_count'].to_numpy(),
+            hovertext=plot_df['display_tags'].to_numpy(),
             mode='markers',
             marker=dict(
-                color=plot_df['log_reviews'],
+                color=plot_df['log_reviews'].to_numpy(),
                 colorscale=px.colors.sequential.Viridis,
+                cmin=prepared['min_log_reviews'],
+                cmax=prepared['max_log_reviews'],
                 opacity=1.0,
-                size=plot_df['size'],
+                size=marker_size,
                 colorbar=dict(title="Отзывы (log10)"),
-                line=dict(
-                    color=plot_df['line_color'],
-                    width=plot_df['line_width']
-                )
+                line=dict(color='red', width=line_width)
             ),
             hovertemplate="<b>%{text}</b><br><br>" +
-                          "Теги: %{customdata[0]}<br>" +
-                          "Отзывы: %{customdata[1]}<extra></extra>",
+                          "Теги: %{hovertext}<br>" +
+                          "Отзывы: %{customdata}<extra></extra>",
             text=plot_df['title'],
             showlegend=False
         ))
@@ -212,6 +347,56 @@ if games_df: # games_df теперь это список словарей
         height=1200 # Увеличиваем фиксированную высоту для графика
     )
 
+    return fig
+
+
+# --- Основная часть приложения ---
+# Загрузка данных
+games_df = load_all_data()
+
+if not games_df.empty:
+    st.sidebar.title("Фильтры")
+
+    prepared = preprocess(games_df)
+    
+    # --- Фильтры ---
+    # 1. Фильтр по названию игры (для выделения)
+    selected_game = st.sidebar.selectbox("Найти и выделить игру:", options=[""] + prepared['sorted_game_names'], index=0)
+
+    # 2. Фильтр по тегам
+    selected_display_tags = st.sidebar.multiselect("Теги:", options=prepared['sorted_display_tags'])
+
+    # 2. Фильтр по дате релиза
+    min_date, max_date = prepared['min_date'], prepared['max_date']
+    col1, col2 = st.sidebar.columns(2)
+    with col1:
+        start_date = st.date_input("Дата релиза от:", value=min_date, min_value=min_date, max_value=max_date)
+    with col2:
+        end_date = st.date_input("Дата релиза до:", value=max_date, min_value=min_date, max_value=max_date)
+    start_us = np.datetime64(start_date, 'us').astype(np.int64)
+    end_us = np.datetime64(end_date, 'us').astype(np.int64)
+
+    # 3. Фильтр по цене
+    min_price, max_price = prepared['min_price'], prepared['max_price']
+    col1, col2 = st.sidebar.columns(2)
+    with col1:
+        price_from = st.number_input("Цена от ($):", min_value=min_price, max_value=max_price, value=min_price)
+    with col2:
+        price_to = st.number_input("Цена до ($):", min_value=min_price, max_value=max_price, value=max_price)
+
+    # 4. Фильтр по количеству отзывов
+    min_reviews, max_reviews = prepared['min_reviews'], prepared['max_reviews']
+    col1, col2 = st.sidebar.columns(2)
+    with col1:
+        reviews_from = st.number_input("Отзывов от:", min_value=min_reviews, max_value=max_reviews, value=min_reviews)
+    with col2:
+        reviews_to = st.number_input("Отзывов до:", min_value=min_reviews, max_value=max_reviews, value=max_reviews)
+
+    fig = build_figure(
+        prepared, prepared['data_key'], selected_game, tuple(selected_display_tags),
+        start_us, end_us, price_from, price_to, reviews_from, reviews_to,
+    )
+
     # --- Стилизация и отображение ---
     # CSS для корректных отступов
     st.markdown("""
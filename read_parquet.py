@@ -1,4 +1,5 @@
 import pandas as pd
+import pyarrow.parquet as pq
 
 # Устанавливаем опции для полного отображения
 pd.set_option('display.max_columns', None)
@@ -10,20 +11,22 @@ def read_and_display_parquet():
     """
     Читает указанный Parquet файл, выводит информацию о нем
     и первые несколько строк для демонстрации.
+    Схема и число строк берутся из метаданных файла, а строки для примера -
+    только из первой группы строк, поэтому файл целиком не загружается.
     """
     print(f"Читаю файл '{FILE_TO_READ}'...")
     
     try:
-        # Загружаем Parquet файл в DataFrame
-        df = pd.read_parquet(FILE_TO_READ)
+        parquet_file = pq.ParquetFile(FILE_TO_READ)
 
         # Выводим информацию о столбцах и типах данных
         print("\nИнформация о столбцах и типах данных:")
-        df.info(verbose=True, show_counts=True)
+        print(f"Строк: {parquet_file.metadata.num_rows}, групп строк: {parquet_file.num_row_groups}")
+        print(parquet_file.schema_arrow)
 
-        # Выводим первые 5 строк DataFrame
+        # Выводим первые 5 строк файла
         print(f"\nПервые 5 строк из файла '{FILE_TO_READ}':")
-        print(df.head())
+        print(parquet_file.read_row_group(0).slice(0, 5).to_pandas())
 
     except FileNotFoundError:
         print(f"Ошибка: Файл '{FILE_TO_READ}' не найден.")
@@ -1,11 +1,30 @@
+import io
 import os
-import pandas as pd
-from sqlalchemy import create_engine
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+from sqlalchemy import create_engine, text, Date
 import sys
 
 # --- Константы ---
 PARQUET_FILE = 'games_with_coords.parquet'
 TABLE_NAME = 'games'
+# Файл читается и отправляется в базу пачками: в памяти одновременно
+# находится только одна пачка строк, а не весь набор данных
+BATCH_SIZE = 100_000
+# Как часто фиксировать транзакцию при загрузке (в пачках)
+COMMIT_EVERY_BATCHES = 5
+
+# Индексы под фильтры API (/api/v1/games): без них каждый запрос
+# с фильтром приводит к полному сканированию таблицы
+INDEX_STATEMENTS = [
+    # Keyset-пагинация NDJSON-потока (game_id > ... AND game_id <= ... ORDER BY game_id)
+    f"CREATE UNIQUE INDEX IF NOT EXISTS idx_{TABLE_NAME}_game_id ON {TABLE_NAME} (game_id)",
+    f"CREATE INDEX IF NOT EXISTS idx_{TABLE_NAME}_release_date ON {TABLE_NAME} (release_date)",
+    f"CREATE INDEX IF NOT EXISTS idx_{TABLE_NAME}_original_price ON {TABLE_NAME} (original_price)",
+    f"CREATE INDEX IF NOT EXISTS idx_{TABLE_NAME}_all_reviews_count ON {TABLE_NAME} (all_reviews_count)",
+    f"CREATE INDEX IF NOT EXISTS idx_{TABLE_NAME}_tags ON {TABLE_NAME} USING GIN ((string_to_array(tags, ',')))",
+]
 
 def upload_data():
     """
@@ -30,15 +49,17 @@ def upload_data():
         print(f"Ошибка подключения к базе данных: {e}")
         sys.exit(1)
 
-    # 2. Читаем данные из Parquet файла
+    # 2. Открываем Parquet файл. Читаются только метаданные, строки
+    # загружаются пачками на следующем шаге
     print(f"Шаг 2: Чтение данных из файла '{PARQUET_FILE}'...")
     try:
-        df = pd.read_parquet(PARQUET_FILE)
-        print(f"Загружено {len(df)} строк.")
+        parquet_file = pq.ParquetFile(PARQUET_FILE)
+        print(f"В файле {parquet_file.metadata.num_rows} строк.")
         
         # Очистка названий колонок для совместимости с SQL
         # SQL не любит пробелы, точки и заглавные буквы в названиях
-        df.columns = [col.replace(' ', '_').replace('.', '').lower() for col in df.columns]
+        schema = parquet_file.schema_arrow
+        columns = [col.replace(' ', '_').replace('.', '').lower() for col in schema.names]
 
     except FileNotFoundError:
         print(f"Ошибка: Файл '{PARQUET_FILE}' не найден.")
@@ -50,15 +71,54 @@ def upload_data():
     # 3. Загружаем данные в базу данных
     print(f"Шаг 3: Загрузка данных в таблицу '{TABLE_NAME}'...")
     try:
-        # to_sql - мощный метод Pandas для работы с базами данных
+        # Таблицу создаем по схеме файла через пустой DataFrame
         # if_exists='replace' - если таблица уже существует, она будет удалена и создана заново
         # index=False - не сохраняем индекс DataFrame как отдельную колонку
-        df.to_sql(TABLE_NAME, engine, if_exists='replace', index=False, chunksize=1000)
-        print("Данные успешно загружены в базу данных!")
+        # Колонки дат в пустом DataFrame имеют тип object, поэтому тип для них задаем явно
+        date_columns = {
+            col: Date() for col, field in zip(columns, schema) if pa.types.is_date(field.type)
+        }
+        empty_df = schema.empty_table().rename_columns(columns).to_pandas()
+        empty_df.to_sql(TABLE_NAME, engine, if_exists='replace', index=False, dtype=date_columns)
+
+        # Строки передаем через COPY: каждая пачка из файла записывается
+        # в CSV средствами pyarrow и уходит в базу одним потоком
+        column_list = ', '.join(f'"{col}"' for col in columns)
+        copy_statement = f"COPY {TABLE_NAME} ({column_list}) FROM STDIN WITH CSV"
+        write_options = pa_csv.WriteOptions(include_header=False)
+        loaded_rows = 0
+        raw_connection = engine.raw_connection()
+        try:
+            with raw_connection.cursor() as cursor:
+                for batch_number, batch in enumerate(parquet_file.iter_batches(batch_size=BATCH_SIZE), start=1):
+                    buffer = io.BytesIO()
+                    pa_csv.write_csv(batch, buffer, write_options=write_options)
+                    buffer.seek(0)
+                    cursor.copy_expert(copy_statement, buffer)
+                    loaded_rows += batch.num_rows
+                    if batch_number % COMMIT_EVERY_BATCHES == 0:
+                        raw_connection.commit()
+                        print(f"Загружено {loaded_rows} строк...")
+            raw_connection.commit()
+        finally:
+            raw_connection.close()
+        print(f"Данные успешно загружены в базу данных! Всего строк: {loaded_rows}.")
         
     except Exception as e:
         print(f"Ошибка при загрузке данных в базу: {e}")
         sys.exit(1)
 
+    # 4. Создаем индексы для фильтрации на стороне БД
+    print("Шаг 4: Создание индексов...")
+    try:
+        with engine.begin() as connection:
+            for statement in INDEX_STATEMENTS:
+                connection.execute(text(statement))
+        print("Индексы успешно созданы!")
+
+    except Exception as e:
+        print(f"Ошибка при создании индексов: {e}")
+        sys.exit(1)
+
 if __name__ == '__main__':
     upload_data()
\ No newline at end of file